@@ -1,2 +1,5 @@
 from .signal import *
+from .stream import *
+from .generate import *
+from .decimate import *
 from .tests import *
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, n_bins: int, xlim=None):
+    """Reduce a trace to the min and max of each of `n_bins` bins.
+
+    Keeping both extremes of every bin, in their original order, preserves
+    every visible peak when the bins are no wider than a pixel.
+
+    Args:
+        x (np.ndarray): Sorted x data.
+        y (np.ndarray): y data.
+        n_bins (int): Number of bins, usually the axes width in pixels.
+        xlim (tuple, optional): Only decimate the visible range. Defaults to None (everything).
+
+    Returns:
+        np.ndarray, np.ndarray: The decimated x and y data.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if xlim is not None:
+        # Keep one sample beyond each edge so the line reaches the border.
+        lo = max(np.searchsorted(x, min(xlim), side='left') - 1, 0)
+        hi = min(np.searchsorted(x, max(xlim), side='right') + 1, len(x))
+        x, y = x[lo:hi], y[lo:hi]
+    n = len(y)
+    n_bins = max(int(n_bins), 1)
+    if n <= 2 * n_bins:
+        return x, y
+
+    k = -(-n // n_bins)
+    rows = -(-n // k)
+    # Padding repeats the last sample, so it never creates a new extreme.
+    binned = np.pad(y, (0, rows * k - n), mode='edge').reshape(rows, k)
+    base = np.arange(rows) * k
+    i_min = base + np.argmin(binned, axis=1)
+    i_max = base + np.argmax(binned, axis=1)
+    index = np.stack([np.minimum(i_min, i_max),
+                      np.maximum(i_min, i_max)], axis=1).ravel()
+    index = np.minimum(index, n - 1)
+    return x[index], y[index]
+
+
+class DecimatedLine:
+    """A line plot that only draws a min/max envelope per pixel.
+
+    The full data is kept here and re-decimated whenever the x limits of the
+    axes change or the figure is resized, so zooming and panning reveal the
+    detail while drawing stays constant in cost regardless of the data
+    length.
+    """
+
+    def __init__(self, ax, x, y, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        xd, yd = minmax_decimate(self.x, self.y, self._n_bins())
+        self.line, = ax.plot(xd, yd, **kwargs)
+        # Plain functions are held strongly by the callback registries, which
+        # keeps this object alive as long as the axes and figure.
+        ax.callbacks.connect('xlim_changed', lambda ax: self.update())
+        # Resizing changes the number of pixels, i.e. of bins.
+        ax.figure.canvas.mpl_connect('resize_event',
+                                     lambda event: self.update())
+
+    def _n_bins(self):
+        return max(int(self.ax.bbox.width), 1)
+
+    def update(self):
+        xd, yd = minmax_decimate(self.x, self.y, self._n_bins(),
+                                 self.ax.get_xlim())
+        self.line.set_data(xd, yd)
+        self.ax.figure.canvas.draw_idle()
@@ -0,0 +1,206 @@
+import abc
+import numpy as np
+from .signal import Signal
+
+
+def spawn_rngs(seed=None, n: int = 1):
+    """Create `n` independent random generators from one seed.
+
+    Streams are spawned from a single `np.random.SeedSequence`, so parallel
+    workers each get their own generator without overlapping draws.
+
+    Args:
+        seed (int, optional): Root seed. Defaults to None (fresh entropy).
+        n (int, optional): Number of generators. Defaults to 1.
+
+    Returns:
+        list[np.random.Generator]: The generators.
+    """
+    return [
+        np.random.default_rng(s)
+        for s in np.random.SeedSequence(seed).spawn(n)
+    ]
+
+
+class SignalGenerator(abc.ABC):
+    """Uniformly sampled test signal generated on demand.
+
+    Samples are computed with array operations from their index, so any
+    range `[start, stop)` can be produced without building the rest of the
+    signal, and `chunks` yields a very long signal piece by piece.
+    """
+
+    def __init__(self, n: int, dt: float, t0: float = 0., label: str = ''):
+        self.n = n
+        self.dt = dt
+        self.t0 = t0
+        self.label = label
+
+    @abc.abstractmethod
+    def _samples(self, index: np.ndarray, t: np.ndarray):
+        """Values of the samples with the given indices and times."""
+
+    def samples(self, start: int = 0, stop: int = None):
+        """Generate samples `start` to `stop`.
+
+        Args:
+            start (int, optional): First sample index. Defaults to 0.
+            stop (int, optional): One past the last sample index. Defaults to None (the end).
+
+        Returns:
+            np.ndarray, np.ndarray: time and value of the samples.
+        """
+        if stop is None:
+            stop = self.n
+        index = np.arange(start, stop)
+        t = self.t0 + index * self.dt
+        return t, self._samples(index, t)
+
+    def chunks(self, chunk_size: int = 1 << 20):
+        """Lazily yield the signal in chunks of `chunk_size` samples.
+
+        Yields:
+            np.ndarray, np.ndarray: time and value of each chunk.
+        """
+        for start in range(0, self.n, chunk_size):
+            yield self.samples(start, min(start + chunk_size, self.n))
+
+    def to_signal(self, color=None, label: str = None):
+        """Materialize the whole signal as a `Signal`."""
+        t, val = self.samples()
+        return Signal(val,
+                      t=t,
+                      color=color,
+                      label=self.label if label is None else label)
+
+
+class SquareGenerator(SignalGenerator):
+
+    def __init__(self,
+                 n: int,
+                 dt: float,
+                 freq: float = 1,
+                 amp: float = 1,
+                 init_phase: float = 0,
+                 bias: float = 0,
+                 ideal=False,
+                 t0: float = 0.,
+                 label: str = 'Square Wave'):
+        super().__init__(n, dt, t0=t0, label=label)
+        self.freq = freq
+        self.amp = amp
+        self.init_phase = init_phase
+        self.bias = bias
+        self.ideal = ideal
+
+    def _samples(self, index, t):
+        if self.ideal:
+            period = int(1 / self.freq / self.dt)
+            val = np.where(index % period < period / 2, 1., -1.)
+        else:
+            val = np.sign(np.sin(2 * np.pi * self.freq * t + self.init_phase))
+        return val * self.amp + self.bias
+
+
+class StepGenerator(SignalGenerator):
+
+    def __init__(self,
+                 n: int,
+                 dt: float,
+                 step_time: float = 0,
+                 amp=1.,
+                 t0: float = 0.,
+                 label: str = 'Unit step'):
+        super().__init__(n, dt, t0=t0, label=label)
+        self.step_time = step_time
+        self.amp = amp
+
+    def _samples(self, index, t):
+        return np.where(t > self.step_time, self.amp, 0.)
+
+
+class NoiseGenerator(SignalGenerator):
+    """Gaussian white noise drawn from a `np.random.Generator`.
+
+    The stream is consumed in order, so chunks must be requested
+    sequentially to be reproducible; the values do not depend on the
+    chunk size.
+    """
+
+    def __init__(self,
+                 n: int,
+                 dt: float,
+                 loc: float = 0,
+                 scale: float = 1,
+                 rng=None,
+                 t0: float = 0.,
+                 label: str = 'White Noise'):
+        super().__init__(n, dt, t0=t0, label=label)
+        self.loc = loc
+        self.scale = scale
+        self.rng = np.random.default_rng(rng)
+
+    def _samples(self, index, t):
+        return self.rng.normal(loc=self.loc, scale=self.scale, size=len(index))
+
+
+class ChirpGenerator(SignalGenerator):
+    """Frequency sweep from `f0` at time 0 to `f1` at time `t1`.
+
+    `method` is 'linear' or 'exponential'.
+    """
+
+    def __init__(self,
+                 n: int,
+                 dt: float,
+                 f0: float = 1,
+                 f1: float = 10,
+                 t1: float = 1,
+                 amp: float = 1,
+                 init_phase: float = 0,
+                 method: str = 'linear',
+                 t0: float = 0.,
+                 label: str = 'Chirp'):
+        super().__init__(n, dt, t0=t0, label=label)
+        if method not in ('linear', 'exponential'):
+            raise ValueError(f'Unknown chirp method `{method}`.')
+        self.f0 = f0
+        self.f1 = f1
+        self.t1 = t1
+        self.amp = amp
+        self.init_phase = init_phase
+        self.method = method
+
+    def _samples(self, index, t):
+        if self.method == 'linear':
+            phase = self.f0 * t + (self.f1 - self.f0) / (2 * self.t1) * t**2
+        else:
+            k = self.f1 / self.f0
+            phase = self.f0 * self.t1 / np.log(k) * (k**(t / self.t1) - 1)
+        return self.amp * np.sin(2 * np.pi * phase + self.init_phase)
+
+
+class Chirp(Signal):
+    """Chirp signal on the time array `t`, sampled by `ChirpGenerator`."""
+
+    def __init__(self,
+                 t: np.ndarray,
+                 f0: float = 1,
+                 f1: float = 10,
+                 t1: float = 1,
+                 amp: float = 1,
+                 init_phase: float = 0,
+                 method: str = 'linear',
+                 color=None,
+                 label: str = 'Chirp'):
+        generator = ChirpGenerator(len(t),
+                                   t[1] - t[0],
+                                   f0=f0,
+                                   f1=f1,
+                                   t1=t1,
+                                   amp=amp,
+                                   init_phase=init_phase,
+                                   method=method,
+                                   t0=t[0])
+        _, val = generator.samples()
+        super().__init__(val, t=t, color=color, label=label)
@@ -1,82 +1,105 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pyfftw
+import os
+from .decimate import DecimatedLine
+from .util import save_binary, load_binary
 # from numba import njit
 
+try:
+    # scipy.fft keeps float32 / complex64 input in single precision.
+    from scipy import fft as _fftpack
+except ImportError:  # scipy is optional, numpy >= 2 does the same
+    _fftpack = np.fft
+
 EPSILON = 1e-12 # To avoid calculate log of zero
 
-def fft(x: np.ndarray):
+def complex_dtype(dtype):
+    """The complex dtype matching the precision of `dtype`.
+
+    float32 / complex64 give complex64, anything wider gives complex128.
+    """
+    return np.result_type(dtype, np.complex64)
+
+
+def _fftw(x: np.ndarray, axis: int = -1, direction='FFTW_FORWARD'):
+    """Unshifted FFTW transform along `axis`, in the precision of `x`."""
+    dtype = complex_dtype(x.dtype)
     # Create arrays aligned for FFTW
-    x_aligned = pyfftw.empty_aligned(x.shape, dtype='complex128')
-    X_aligned = pyfftw.empty_aligned(x.shape, dtype='complex128')
+    x_aligned = pyfftw.empty_aligned(x.shape, dtype=dtype)
+    X_aligned = pyfftw.empty_aligned(x.shape, dtype=dtype)
 
     # Initialize FFT object
-    fft_object = pyfftw.FFTW(x_aligned, X_aligned)
+    # FFTW_ESTIMATE: a measured plan costs far more than a one-off transform.
+    fft_object = pyfftw.FFTW(x_aligned,
+                             X_aligned,
+                             axes=(axis, ),
+                             direction=direction,
+                             flags=('FFTW_ESTIMATE', ))
 
     # Copy data to FFTW input
     x_aligned[:] = x
 
-    # Compute FFT and shift
     fft_object()  # FFT is performed in-place
-    X = np.fft.fftshift(X_aligned)
-
-    return X
+    return X_aligned
 
 
-def ifft(X: np.ndarray):
-    # Create arrays aligned for FFTW
-    X_aligned = pyfftw.empty_aligned(X.shape, dtype='complex128')
-    x_aligned = pyfftw.empty_aligned(X.shape, dtype='complex128')
-
-    # Initialize IFFT object
-    ifft_object = pyfftw.FFTW(X_aligned, x_aligned, direction='FFTW_BACKWARD')
+def fft(x: np.ndarray, axis: int = -1):
+    # Compute FFT and shift
+    return np.fft.fftshift(_fftw(x, axis), axes=axis)
 
-    # Copy data to FFTW input
-    X_aligned[:] = X
 
+def ifft(X: np.ndarray, axis: int = -1):
     # Compute IFFT and shift
-    ifft_object()  # IFFT is performed in-place
-    x = np.fft.ifftshift(x_aligned)
-
-    return x
+    return np.fft.ifftshift(_fftw(X, axis, direction='FFTW_BACKWARD'),
+                            axes=axis)
 
 
 # @njit
-def t_to_f(x: np.ndarray, dt: float):
+def t_to_f(x: np.ndarray, dt: float, axis: int = -1):
     """transform signal from time domain to frequency domain
 
     Args:
         x (np.ndarray): input data in time domain
         dt (float): time resolution
+        axis (int, optional): the time axis of `x`. Defaults to -1.
 
     Returns:
         np.ndarray, float, np.ndarray: frequency array, frequency resolution, signal in frequency domain
     """
     f, df = np.linspace(-.5 / dt,
                         .5 / dt,
-                        len(x),
+                        np.shape(x)[axis],
                         endpoint=False,
                         retstep=True)
-    X = np.fft.fftshift(np.fft.fft(x))
-    # X = np.fft.fftshift(fft(x))
+    x = np.asarray(x)
+    X = np.fft.fftshift(_fftpack.fft(x, axis=axis), axes=axis)
+    # numpy < 2 without scipy returns complex128 for float32 input.
+    X = X.astype(complex_dtype(x.dtype), copy=False)
     return f, df, X
 
 
 # @njit
-def f_to_t(X: np.ndarray, df: float, t0: float = 0):
+def f_to_t(X: np.ndarray, df: float, t0: float = 0, axis: int = -1):
     """transform signal from frequency domain to time domain
 
     Args:
         X (np.ndarray): input data in frequency domain
         df (float): frequency resolution
         t0 (float, optional): the begin time of time array. Defaults to 0.
+        axis (int, optional): the frequency axis of `X`. Defaults to -1.
 
     Returns:
         np.ndarray, float, np.ndarray: time sequence, time resolution, data in time domain
     """
-    t, dt = np.linspace(t0, t0 + 1 / df, len(X), endpoint=False, retstep=True)
-    x = np.fft.ifft(np.fft.ifftshift(X))
-    # x = ifft(np.fft.ifftshift(X))
+    t, dt = np.linspace(t0,
+                        t0 + 1 / df,
+                        np.shape(X)[axis],
+                        endpoint=False,
+                        retstep=True)
+    X = np.asarray(X)
+    x = _fftpack.ifft(np.fft.ifftshift(X, axes=axis), axis=axis)
+    x = x.astype(complex_dtype(X.dtype), copy=False)
     return t, dt, x
 
 
@@ -91,7 +114,17 @@ class Signal:
         f=None,
         color=None,
         label: str = '',
+        dtype=None,
     ):
+        """
+        Args:
+            val (np.ndarray): Samples in time domain (with `t`) or frequency domain (with `f`).
+            t (np.ndarray, optional): Time array. Defaults to None.
+            f (np.ndarray, optional): Frequency array. Defaults to None.
+            color (optional): The color when plotting. Defaults to None.
+            label (str, optional): The label when plotting. Defaults to ''.
+            dtype (optional): Storage precision, e.g. np.float32 to keep samples in float32 and the spectrum in complex64. Defaults to None (keep the input precision).
+        """
         self.color = color
         self.label = label
         if t is None and f is not None:
@@ -101,7 +134,8 @@ class Signal:
                 )
             self.f = np.array(f)
             self.df = f[1] - f[0]
-            self.X = np.array(val)
+            self.X = np.array(val,
+                              dtype=None if dtype is None else complex_dtype(dtype))
             self.t, self.dt, self.x = f_to_t(self.X, self.df, 0)
             # self.x = np.real(self.x)
         elif t is not None and f is None:
@@ -112,18 +146,32 @@ class Signal:
             self.t = np.array(t)
             self.t = self.t - self.t[0]
             self.dt = t[1] - t[0]
-            self.x = np.array(val)
+            self.x = np.array(val, dtype=dtype)
             self.f, self.df, self.X = t_to_f(self.x, self.dt)
         else:
             return
 
-    def plot_time_domain(self, ax=None, show=False, block=False):
+    @classmethod
+    def _from_arrays(cls, x, X, t, f, color=None, label: str = ''):
+        """Build a signal from precomputed time and frequency data, skipping the transform."""
+        sig = cls.__new__(cls)
+        Signal.__init__(sig, None, color=color, label=label)
+        sig.t = t
+        sig.dt = t[1] - t[0]
+        sig.x = x
+        sig.f = f
+        sig.df = f[1] - f[0]
+        sig.X = X
+        return sig
+
+    def plot_time_domain(self, ax=None, show=False, block=False, decimate=True):
         """Plot the signal in time domain
 
         Args:
             ax (matplotlib.axes.Axes, optional): The figure to plot on. Defaults to None.
             show (bool, optional): Show. Defaults to False.
             block (bool, optional): Block. Defaults to False.
+            decimate (bool, optional): Draw a per-pixel min/max envelope, refreshed on zoom and pan. Defaults to True.
 
         Returns:
             Matplotlib axes.
@@ -135,8 +183,12 @@ class Signal:
         else:
             fig = ax.figure  # 获取Axes所属的Figure对象
 
-        ax.plot(self.t, np.real(self.x), color=self.color,
-                label=self.label)  # 使用提供的x_data和y_data进行作图
+        if decimate:
+            DecimatedLine(ax, self.t, np.real(self.x), color=self.color,
+                          label=self.label)
+        else:
+            ax.plot(self.t, np.real(self.x), color=self.color,
+                    label=self.label)  # 使用提供的x_data和y_data进行作图
         # ax.set_title('Data Plot')
         # ax.set_xlabel('X-Axis')
         # ax.set_ylabel('Y-Axis')
@@ -152,7 +204,8 @@ class Signal:
                          ax_power=None,
                          ax_phase=None,
                          show=False,
-                         block=False):
+                         block=False,
+                         decimate=True):
         """Plot the signal in frequency domain
 
         Args:
@@ -160,6 +213,7 @@ class Signal:
             ax_phase (matplotlib.axes.Axes, optional): The axe to plot phase. Defaults to None.
             show (bool, optional): Show. Defaults to False.
             block (bool, optional): Block. Defaults to False.
+            decimate (bool, optional): Draw a per-pixel min/max envelope, refreshed on zoom and pan. Defaults to True.
 
         Returns:
             Matplotlib axes.
@@ -181,16 +235,16 @@ class Signal:
         epsilon = min(non_zero_min * 0.01, mean_amplitude * 0.01,
                       np.finfo(self.X.dtype).tiny)
 
-        ax_power.plot(
-            self.f,
-            # 20 * np.log10(np.abs(self.X) + epsilon),
-            np.abs(self.X),
-            color=self.color,
-            label=self.label)
-        ax_phase.plot(self.f,
-                      np.angle(self.X + epsilon, deg=True),
-                      color=self.color,
-                      label=self.label)
+        power = np.abs(self.X)  # 20 * np.log10(np.abs(self.X) + epsilon)
+        phase = np.angle(self.X + epsilon, deg=True)
+        if decimate:
+            DecimatedLine(ax_power, self.f, power, color=self.color,
+                          label=self.label)
+            DecimatedLine(ax_phase, self.f, phase, color=self.color,
+                          label=self.label)
+        else:
+            ax_power.plot(self.f, power, color=self.color, label=self.label)
+            ax_phase.plot(self.f, phase, color=self.color, label=self.label)
 
         ax_power.legend(loc='upper right')
         ax_phase.legend(loc='upper right')
@@ -200,6 +254,30 @@ class Signal:
 
         return ax_power, ax_phase
     
+    def save(self, filename, spectrum: bool = True):
+        """Save the signal in the binary signal format.
+
+        The axes are stored as dt (time starts at 0) and f0/df instead of
+        full arrays, so signals built from an offset frequency axis load
+        back with the same `f`.
+
+        Args:
+            filename (str): Output file.
+            spectrum (bool, optional): Also store the spectrum, so loading skips the FFT. Defaults to True.
+        """
+        arrays = {'x': self.x}
+        if spectrum:
+            arrays['X'] = self.X
+        save_binary(filename,
+                    arrays,
+                    meta={
+                        'kind': 'signal',
+                        'dt': float(self.dt),
+                        'f0': float(self.f[0]),
+                        'df': float(self.df),
+                        'label': self.label,
+                    })
+
     def dominant_freq(self):
         positive_frequencies = self.f[self.f>0]
         magnitudes = np.abs(self.X)[self.f>0]
@@ -207,6 +285,82 @@ class Signal:
         return positive_frequencies[np.argmax(magnitudes)]
 
 
+class SignalBatch:
+    """A batch of signals sharing one time / frequency axis.
+
+    Each row of `val` is one signal. Transforms run along the last axis in a
+    single call, so parameter sweeps avoid per-signal Python and allocation
+    overhead. `dtype` selects the storage precision as for `Signal`.
+    """
+
+    def __init__(
+        self,
+        val: np.ndarray,
+        t=None,
+        f=None,
+        color=None,
+        labels=None,
+        dtype=None,
+    ):
+        val = np.atleast_2d(val)
+        self.color = color
+        if labels is None:
+            labels = [''] * len(val)
+        if len(labels) != len(val):
+            raise ValueError(
+                f'`labels` must have one entry per row, but have {len(labels)} labels for {len(val)} rows'
+            )
+        self.labels = list(labels)
+        if t is None and f is not None:
+            if val.shape[-1] != len(f):
+                raise ValueError(
+                    f'`val` rows and `f` must have same length, but have length {val.shape[-1]} and {len(f)}'
+                )
+            self.f = np.array(f)
+            self.df = f[1] - f[0]
+            self.X = val if dtype is None else val.astype(complex_dtype(dtype))
+            self.t, self.dt, self.x = f_to_t(self.X, self.df, 0)
+        elif t is not None and f is None:
+            if val.shape[-1] != len(t):
+                raise ValueError(
+                    f'`val` rows and `t` must have same length, but have length {val.shape[-1]} and {len(t)}'
+                )
+            self.t = np.array(t)
+            self.t = self.t - self.t[0]
+            self.dt = t[1] - t[0]
+            self.x = val if dtype is None else val.astype(dtype)
+            self.f, self.df, self.X = t_to_f(self.x, self.dt)
+        else:
+            raise ValueError('Exactly one of `t` and `f` must be given.')
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index):
+        """Row `index` as a standalone `Signal`, sharing this batch's axes."""
+        if not isinstance(index, (int, np.integer)):
+            raise TypeError(
+                f'SignalBatch indices must be integers, not {type(index).__name__}')
+        return Signal._from_arrays(self.x[index],
+                                   self.X[index],
+                                   self.t,
+                                   self.f,
+                                   color=self.color,
+                                   label=self.labels[index])
+
+    def dominant_freq(self):
+        """Dominant positive frequency of every row.
+
+        Returns:
+            np.ndarray: One frequency per row.
+        """
+        positive = self.f > 0
+        positive_frequencies = self.f[positive]
+        magnitudes = np.abs(self.X[:, positive])
+
+        return positive_frequencies[np.argmax(magnitudes, axis=1)]
+
+
 class Filter:
 
     def __init__(
@@ -228,15 +382,26 @@ class Filter:
         """Apply filter to target signal in frequency domain.
 
         Args:
-            sig (Signal): Input signal
+            sig (Signal | SignalBatch): Input signal, or a batch of signals sharing one axis
             color (_type_, optional): The color of output signal when plotting. Defaults to None.
-            label (str, optional): The label of the output signal. Defaults to ''.
+            label (str, optional): The label of the output signal. Defaults to '' (for a batch, keep the input labels).
 
         Returns:
-            Signal: Output.
+            Signal | SignalBatch: Output, of the same kind as `sig`.
         """
         filt = self.filter(sig.f)
-        out = Signal(filt * sig.X, f=sig.f, color=color, label=label)
+        if isinstance(sig, SignalBatch):
+            # One response for the shared axis, broadcast over all rows.
+            return SignalBatch(filt * sig.X,
+                               f=sig.f,
+                               color=color,
+                               labels=[label] * len(sig) if label else sig.labels,
+                               dtype=sig.X.dtype)
+        out = Signal(filt * sig.X,
+                     f=sig.f,
+                     color=color,
+                     label=label,
+                     dtype=sig.X.dtype)
         return out
 
     def plot(
@@ -265,11 +430,66 @@ class Filter:
                                     show=show,
                                     block=block)
 
-def load_from_text(filename, label='data'):
+def load_signal(filename, mmap: bool = True, color=None, label: str = None):
+    """Load a signal saved by `Signal.save`.
+
+    Args:
+        filename (str): Input file.
+        mmap (bool, optional): Memory map the samples instead of reading them. Defaults to True.
+        color (optional): The color of the signal when plotting. Defaults to None.
+        label (str, optional): Label, defaults to the stored one.
+
+    Returns:
+        Signal: The signal.
+    """
+    arrays, meta = load_binary(filename, mmap=mmap)
+    if meta.get('kind') != 'signal':
+        raise ValueError(f'`{filename}` does not contain a signal.')
+    if label is None:
+        label = meta['label']
+    x = arrays['x']
+    n = len(x)
+    dt = meta['dt']
+    df = meta['df']
+    t = np.linspace(0, n * dt, n, endpoint=False)
+    f = np.linspace(meta['f0'], meta['f0'] + n * df, n, endpoint=False)
+    if 'X' in arrays:
+        X = arrays['X']
+    else:
+        # The transform keeps the sample order of the stored axis.
+        _, _, X = t_to_f(x, dt)
+    return Signal._from_arrays(x, X, t, f, color=color, label=label)
+
+
+def load_from_text(filename, label='data', cache=True):
+    """Load a two column (time, value) text file as a signal.
+
+    Args:
+        filename (str): Input text file.
+        label (str, optional): Label of the signal. Defaults to 'data'.
+        cache (bool, optional): Keep a binary copy next to the text file and load that while it is newer than the text. Defaults to True.
+
+    Returns:
+        Signal: The signal.
+    """
+    cache_file = f'{filename}.sig'
+    if cache and os.path.exists(cache_file) and \
+            os.path.getmtime(cache_file) >= os.path.getmtime(filename):
+        # Read rather than memory map, so the samples are writable either way.
+        try:
+            return load_signal(cache_file, mmap=False, label=label)
+        except (OSError, ValueError):
+            os.remove(cache_file)  # Corrupt cache, parse the text again.
     data = np.loadtxt(filename).transpose()
     t = data[0]
     val = data[1]
-    return Signal(val, t=t, label=label)
+    sig = Signal(val, t=t, label=label)
+    if cache:
+        try:
+            sig.save(cache_file)
+        except OSError:
+            pass  # Read-only location, just skip caching.
+    return sig
 
 
 class WhiteNoise(Signal):
@@ -279,10 +499,14 @@ class WhiteNoise(Signal):
         t: np.ndarray,
         loc: float = 0,
         scale: float = 1,
+        rng=None,
         color=None,
         label: str = 'White Noise',
     ):
-        noise = np.random.normal(loc=loc, scale=scale, size=len(t))
+        # `rng` may be a seed or a np.random.Generator.
+        noise = np.random.default_rng(rng).normal(loc=loc,
+                                                  scale=scale,
+                                                  size=len(t))
         super().__init__(val=noise, t=t, color=color, label=label)
 
 
@@ -315,12 +539,8 @@ class SquareWave(Signal):
         period = 1 / freq
         dt = t[1] - t[0]
         if ideal:
-            # val = []
             period = int(period / dt)
-            # for _ in range(len(t)):
-            val = np.array(
-                [1 if _ % period < period / 2 else -1 for _ in range(len(t))],
-                dtype=np.float64)
+            val = np.where(np.arange(len(t)) % period < period / 2, 1., -1.)
         else:
             val = np.sign(np.sin(2 * np.pi * freq * t + init_phase))
         val = val * amp + bias
@@ -0,0 +1,293 @@
+import abc
+import numpy as np
+from .signal import Filter
+
+try:
+    from scipy.signal import sosfilt as _sosfilt
+except ImportError:  # scipy is optional, fall back to a pure numpy loop
+    _sosfilt = None
+
+
+def fir_from_filter(filt: Filter, dt: float, numtaps: int = 255, window=np.hanning):
+    """Design FIR taps from the frequency response of a `Filter`.
+
+    The response is sampled on `numtaps` frequencies, transformed back to the
+    time domain, centered and windowed (frequency sampling design). Centering
+    makes the taps causal at the cost of a group delay of `numtaps // 2`
+    samples: the filtered output lags `Filter.apply` by that much.
+
+    Args:
+        filt (Filter): The filter whose response `filt.filter(f)` is sampled.
+        dt (float): Time resolution of the signals to be filtered.
+        numtaps (int, optional): Number of taps. Defaults to 255.
+        window (callable, optional): Window function taking a length. Defaults to np.hanning.
+
+    Returns:
+        np.ndarray: FIR taps, real if the response is hermitian.
+    """
+    f = np.fft.fftfreq(numtaps, dt)
+    h = np.fft.ifft(np.ones(numtaps) * filt.filter(f))
+    h = np.roll(h, numtaps // 2)
+    if window is not None:
+        h = h * window(numtaps)
+    return np.real_if_close(h)
+
+
+class _BlockFIR(abc.ABC):
+    """Common state of the block based FIR engines.
+
+    `delay` is the group delay of the taps in samples, e.g. `numtaps // 2`
+    for taps from `fir_from_filter`: output sample `i` belongs to input time
+    `i - delay`.
+    """
+
+    def __init__(self, taps: np.ndarray, block_size: int = None, delay: int = 0):
+        self.taps = np.asarray(taps)
+        self.delay = delay
+        if self.taps.ndim != 1 or len(self.taps) == 0:
+            raise ValueError('`taps` must be a non-empty 1-D array.')
+        m = len(self.taps)
+        if block_size is None:
+            nfft = 1 << int(np.ceil(np.log2(max(4 * m, 1024))))
+            block_size = nfft - m + 1
+        if block_size < m - 1:
+            raise ValueError(
+                f'`block_size` must be at least len(taps) - 1 = {m - 1}, but is {block_size}'
+            )
+        self.block_size = block_size
+        self.nfft = 1 << int(np.ceil(np.log2(block_size + m - 1)))
+        self._real = np.isrealobj(self.taps)
+        if self._real:
+            self._H = np.fft.rfft(self.taps, self.nfft)
+        else:
+            self._H = np.fft.fft(self.taps, self.nfft)
+        self.reset()
+
+    @classmethod
+    def from_filter(cls, filt: Filter, dt: float, numtaps: int = 255, block_size: int = None):
+        """Build the engine from the frequency response of a `Filter`.
+
+        The output lags the input by `delay = numtaps // 2` samples, e.g.
+        the output matching `simulation_data['time'][i]` is sample
+        `i + engine.delay`.
+
+        Args:
+            filt (Filter): Filter to realize.
+            dt (float): Time resolution of the incoming samples.
+            numtaps (int, optional): Number of FIR taps. Defaults to 255.
+            block_size (int, optional): Samples per block. Defaults to None (chosen from numtaps).
+
+        Returns:
+            The engine.
+        """
+        return cls(fir_from_filter(filt, dt, numtaps),
+                   block_size=block_size,
+                   delay=numtaps // 2)
+
+    @abc.abstractmethod
+    def reset(self):
+        """Clear the state carried between calls to `process`."""
+
+    def _convolve_frames(self, frames: np.ndarray):
+        """Circular convolution of every row of `frames` with the taps."""
+        if self._real and np.isrealobj(frames):
+            return np.fft.irfft(np.fft.rfft(frames, self.nfft) * self._H, self.nfft)
+        H = self._H
+        if self._real:
+            H = np.fft.fft(self.taps, self.nfft)
+        return np.fft.ifft(np.fft.fft(frames, self.nfft) * H, self.nfft)
+
+    @abc.abstractmethod
+    def process(self, chunk: np.ndarray):
+        """Filter the next chunk, returning as many samples as given."""
+
+    def filter(self, x: np.ndarray, chunk_size: int = None):
+        """Filter a whole signal block by block.
+
+        Args:
+            x (np.ndarray): Input samples.
+            chunk_size (int, optional): Samples handed to `process` at once. Defaults to None (all).
+
+        Returns:
+            np.ndarray: Output samples, same length as `x`.
+        """
+        self.reset()
+        if chunk_size is None:
+            return self.process(x)
+        return np.concatenate([
+            self.process(x[i:i + chunk_size])
+            for i in range(0, len(x), chunk_size)
+        ])
+
+
+class OverlapAdd(_BlockFIR):
+    """Streaming FIR filter using the overlap-add method.
+
+    Every call to `process` returns exactly as many samples as it is given,
+    the convolution tail is carried over to the next call.
+    """
+
+    def reset(self):
+        self._tail = np.zeros(len(self.taps) - 1)
+
+    def process(self, chunk: np.ndarray):
+        chunk = np.asarray(chunk)
+        n = len(chunk)
+        m = len(self.taps)
+        L = self.block_size
+        if n == 0:
+            return chunk[:0]
+        B = -(-n // L)
+        blocks = np.zeros((B, L), dtype=chunk.dtype)
+        blocks.ravel()[:n] = chunk
+        y = self._convolve_frames(blocks)
+
+        out = np.zeros(B * L + m - 1, dtype=y.dtype)
+        out[:m - 1] += self._tail
+        out[:B * L] += y[:, :L].ravel()
+        # The tail of each block overlaps the start of the next one.
+        tails = np.zeros((B, L), dtype=y.dtype)
+        tails[:, :m - 1] = y[:, L:L + m - 1]
+        out[L:L + B * L] += tails.ravel()[:len(out) - L]
+
+        self._tail = out[n:n + m - 1].copy()
+        return out[:n]
+
+
+class OverlapSave(_BlockFIR):
+    """Streaming FIR filter using the overlap-save method.
+
+    The last `len(taps) - 1` input samples are kept as history, so every
+    call to `process` returns exactly as many samples as it is given.
+    """
+
+    def reset(self):
+        self._history = np.zeros(len(self.taps) - 1)
+
+    def process(self, chunk: np.ndarray):
+        chunk = np.asarray(chunk)
+        n = len(chunk)
+        m = len(self.taps)
+        L = self.block_size
+        if n == 0:
+            return chunk[:0]
+        B = -(-n // L)
+        x = np.concatenate([self._history, chunk])
+        padded = np.zeros(B * L + self.nfft - L, dtype=x.dtype)
+        padded[:len(x)] = x
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.nfft)[::L]
+        y = self._convolve_frames(frames)
+
+        self._history = x[len(x) - (m - 1):].copy()
+        return y[:, m - 1:m - 1 + L].ravel()[:n]
+
+
+class SOSFilter:
+    """Stateful IIR filter in second-order sections.
+
+    Each row of `sos` is `[b0, b1, b2, a0, a1, a2]`, the layout used by
+    scipy.signal. The filter state is kept between calls to `process`.
+    """
+
+    def __init__(self, sos: np.ndarray):
+        sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        if sos.shape[1] != 6:
+            raise ValueError(f'`sos` must have shape (n_sections, 6), but has shape {sos.shape}')
+        # Normalize so that a0 == 1 for every section.
+        self.sos = sos / sos[:, 3:4]
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros((len(self.sos), 2))
+
+    def process(self, chunk: np.ndarray):
+        """Filter the next chunk, continuing from the state of the last call.
+
+        Args:
+            chunk (np.ndarray): Input samples.
+
+        Returns:
+            np.ndarray: Output samples, same length as `chunk`.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if _sosfilt is not None:
+            y, self.zi = _sosfilt(self.sos, chunk, zi=self.zi)
+            return y
+
+        y = chunk.copy()
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            z0, z1 = self.zi[s]
+            for i in range(len(y)):
+                # Direct form II transposed.
+                xi = y[i]
+                yi = b0 * xi + z0
+                z0 = b1 * xi - a1 * yi + z1
+                z1 = b2 * xi - a2 * yi
+                y[i] = yi
+            self.zi[s] = z0, z1
+        return y
+
+    def filter(self, x: np.ndarray):
+        self.reset()
+        return self.process(x)
+
+
+class StreamTap:
+    """Filter recorder output incrementally while a simulation is running.
+
+    `source` returns the growing record of samples, e.g.
+    `lambda: pendulum.simulation_data['angle']` or
+    `lambda: planet.simulation_data['position']` with `select=lambda p: p[:, 0]`.
+    Every call to `poll` feeds the samples recorded since the last poll
+    through the engine.
+    """
+
+    def __init__(self, engine, source, select=None):
+        self.engine = engine
+        self.source = source
+        self.select = select
+        self._consumed = 0
+        self._output = []
+
+    @property
+    def output(self):
+        """All filtered samples produced so far."""
+        if len(self._output) == 0:
+            return np.zeros(0)
+        return np.concatenate(self._output)
+
+    def poll(self):
+        """Filter the samples recorded since the last call.
+
+        Returns:
+            np.ndarray: The newly filtered samples.
+        """
+        samples = self.source()
+        new = samples[self._consumed:]
+        self._consumed = len(samples)
+        if len(new) == 0:
+            return np.zeros(0)
+        new = np.asarray(new)
+        if self.select is not None:
+            new = self.select(new)
+        out = self.engine.process(new)
+        self._output.append(out)
+        return out
+
+    def attach(self, env, interval: float):
+        """Poll every `interval` of simulated time as a simpy process.
+
+        Args:
+            env (simpy.Environment): The environment the recorder runs in.
+            interval (float): Simulated time between polls.
+
+        Returns:
+            simpy.Process: The polling process.
+        """
+
+        def run():
+            while True:
+                yield env.timeout(interval)
+                self.poll()
+
+        return env.process(run())
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from analyze.signal import Filter, Signal, SignalBatch
+
+
+def _rows():
+    t = np.arange(2048) * 1e-3
+    freqs = [5., 20., 61., 150.]
+    rows = np.array([np.sin(2 * np.pi * f * t) + .3 * np.cos(2 * np.pi * 3 * f * t) for f in freqs])
+    return t, rows
+
+
+def test_dominant_freq_matches_signals():
+    t, rows = _rows()
+    batch = SignalBatch(rows, t=t)
+    expected = [Signal(row, t=t).dominant_freq() for row in rows]
+    np.testing.assert_array_equal(batch.dominant_freq(), expected)
+
+
+def test_filter_matches_signals():
+    t, rows = _rows()
+    batch = SignalBatch(rows, t=t, labels=['a', 'b', 'c', 'd'])
+    lowpass = Filter(lambda f: 1 / (1 + 1j * f / 40))
+    out = lowpass.apply(batch)
+    assert isinstance(out, SignalBatch)
+    assert out.labels == ['a', 'b', 'c', 'd']
+    for i, row in enumerate(rows):
+        expected = lowpass.apply(Signal(row, t=t))
+        np.testing.assert_allclose(out[i].X, expected.X, atol=1e-9)
+        np.testing.assert_allclose(out[i].x, expected.x, atol=1e-9)
+    assert lowpass.apply(batch, label='low').labels == ['low'] * 4
+
+
+def test_getitem_rejects_slices():
+    t, rows = _rows()
+    batch = SignalBatch(rows, t=t, labels=['a', 'b', 'c', 'd'])
+    assert batch[np.int64(2)].label == 'c'
+    with pytest.raises(TypeError):
+        batch[1:2]
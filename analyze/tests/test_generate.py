@@ -0,0 +1,34 @@
+import numpy as np
+from analyze.generate import SquareGenerator, StepGenerator, NoiseGenerator
+from analyze.generate import ChirpGenerator, spawn_rngs
+
+
+def test_chunks_match_samples():
+    n, dt = 10007, 1e-4
+    generators = [
+        SquareGenerator(n, dt, freq=62.5, amp=.5, bias=.5, ideal=True),
+        SquareGenerator(n, dt, freq=62.5, init_phase=.3),
+        StepGenerator(n, dt, step_time=.3),
+        ChirpGenerator(n, dt, f0=1, f1=50, t1=1),
+        ChirpGenerator(n, dt, f0=1, f1=50, t1=1, method='exponential'),
+    ]
+    for generator in generators:
+        t, val = generator.samples()
+        for chunk_size in (7, 1000, 4096, n + 1):
+            chunk_t, chunk_val = zip(*generator.chunks(chunk_size))
+            np.testing.assert_allclose(np.concatenate(chunk_t), t, rtol=1e-12)
+            np.testing.assert_allclose(np.concatenate(chunk_val), val, rtol=1e-12, atol=1e-12)
+
+
+def test_noise_independent_of_chunk_size():
+    n = 10007
+    _, reference = NoiseGenerator(n, 1e-3, loc=1, scale=2, rng=42).samples()
+    for chunk_size in (1, 100, 4096):
+        generator = NoiseGenerator(n, 1e-3, loc=1, scale=2, rng=42)
+        val = np.concatenate([v for _, v in generator.chunks(chunk_size)])
+        np.testing.assert_array_equal(val, reference)
+
+
+def test_spawned_streams_differ():
+    a, b = spawn_rngs(0, 2)
+    assert not np.array_equal(a.normal(size=100), b.normal(size=100))
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import analyze.stream
+from analyze.signal import Filter, Signal
+from analyze.stream import OverlapAdd, OverlapSave, SOSFilter
+
+SOS = np.array([
+    [0.0675, 0.135, 0.0675, 1., -1.143, 0.4128],
+    [1., 2., 1., 1., -1.4, 0.6],
+])
+
+
+def _sos_reference(sos, x):
+    y = np.array(x, dtype=np.float64)
+    for b0, b1, b2, a0, a1, a2 in sos:
+        x_in, y = y, np.zeros_like(y)
+        for n in range(len(y)):
+            acc = b0 * x_in[n]
+            if n >= 1:
+                acc += b1 * x_in[n - 1] - a1 * y[n - 1]
+            if n >= 2:
+                acc += b2 * x_in[n - 2] - a2 * y[n - 2]
+            y[n] = acc / a0
+    return y
+
+
+@pytest.mark.parametrize('engine', [OverlapAdd, OverlapSave])
+@pytest.mark.parametrize('block_size', [None, 31, 100])
+@pytest.mark.parametrize('chunk_size', [None, 1, 17, 1000])
+def test_block_fir_matches_convolve(engine, block_size, chunk_size):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=2500)
+    taps = rng.normal(size=32)
+    expected = np.convolve(x, taps)[:len(x)]
+    out = engine(taps, block_size=block_size).filter(x, chunk_size=chunk_size)
+    np.testing.assert_allclose(out, expected, atol=1e-10)
+
+
+@pytest.mark.parametrize('engine', [OverlapAdd, OverlapSave])
+def test_block_fir_complex_taps(engine):
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=1000)
+    taps = rng.normal(size=16) + 1j * rng.normal(size=16)
+    expected = np.convolve(x, taps)[:len(x)]
+    out = engine(taps, block_size=50).filter(x, chunk_size=123)
+    np.testing.assert_allclose(out, expected, atol=1e-10)
+
+
+@pytest.mark.parametrize('use_scipy', [True, False])
+@pytest.mark.parametrize('chunk_size', [1, 64, 1000])
+def test_sos_filter_chunks(monkeypatch, use_scipy, chunk_size):
+    if use_scipy:
+        pytest.importorskip('scipy')
+    else:
+        monkeypatch.setattr(analyze.stream, '_sosfilt', None)
+    x = np.random.default_rng(2).normal(size=1000)
+    expected = _sos_reference(SOS, x)
+    sos = SOSFilter(SOS)
+    out = np.concatenate([
+        sos.process(x[i:i + chunk_size]) for i in range(0, len(x), chunk_size)
+    ])
+    np.testing.assert_allclose(out, expected, atol=1e-10)
+
+
+@pytest.mark.parametrize('engine', [OverlapAdd, OverlapSave])
+def test_from_filter_delay(engine):
+    dt = 1e-3
+    t = np.arange(4096) * dt
+    # Whole periods in the record, so the circular reference has no edges.
+    df = 1 / (len(t) * dt)
+    x = np.sin(2 * np.pi * 20 * df * t) + np.sin(2 * np.pi * 800 * df * t)
+    lowpass = Filter(lambda f: (np.abs(f) < 50).astype(np.float64))
+    stream = engine.from_filter(lowpass, dt, numtaps=255)
+    assert stream.delay == 127
+    out = stream.filter(x, chunk_size=500)
+    expected = lowpass.apply(Signal(x, t=t)).x.real
+    # Away from the edges, the streamed output is the shifted reference.
+    inner = slice(300, len(x) - 300)
+    aligned = out[stream.delay:][inner]
+    np.testing.assert_allclose(aligned, expected[:len(x) - stream.delay][inner], atol=1e-2)
@@ -0,0 +1,3 @@
+# The binary container lives in the top level `binfile` module, which only
+# depends on numpy, so that `simu` can use it without importing `analyze`.
+from binfile import BINARY_MAGIC, BINARY_ALIGN, save_binary, load_binary
@@ -0,0 +1,86 @@
+import json
+import os
+import numpy as np
+
+BINARY_MAGIC = b'SIMUBIN1'
+BINARY_ALIGN = 64
+
+
+def _align(n: int):
+    return -(-n // BINARY_ALIGN) * BINARY_ALIGN
+
+
+def save_binary(filename, arrays: dict, meta: dict = None):
+    """Save named arrays and json metadata to one binary file.
+
+    The file is a magic string, the header length, a json header and the raw
+    array data, each array aligned to 64 bytes so that it can be memory
+    mapped in place.
+
+    Args:
+        filename (str): Output file.
+        arrays (dict): Array name to np.ndarray.
+        meta (dict, optional): Extra json serializable metadata. Defaults to None.
+    """
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {
+            'dtype': arr.dtype.str,
+            'shape': list(arr.shape),
+            'offset': offset,
+        }
+        offset = _align(offset + arr.nbytes)
+    header = json.dumps({
+        'meta': meta or {},
+        'arrays': layout
+    }).encode('utf-8')
+    data_start = _align(len(BINARY_MAGIC) + 8 + len(header))
+
+    # Write next to the target first so readers never see a partial file.
+    tmp = f'{filename}.tmp{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(BINARY_MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            arr.tofile(f)
+    os.replace(tmp, filename)
+
+
+def load_binary(filename, mmap: bool = True):
+    """Load a file written by `save_binary`.
+
+    Args:
+        filename (str): Input file.
+        mmap (bool, optional): Memory map the arrays instead of reading them. Defaults to True.
+
+    Returns:
+        dict, dict: arrays and metadata.
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f'`{filename}` is not a binary data file.')
+        header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    data_start = _align(len(BINARY_MAGIC) + 8 + header_len)
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        offset = data_start + info['offset']
+        if mmap and int(np.prod(shape)) > 0:
+            arrays[name] = np.memmap(filename,
+                                     dtype=dtype,
+                                     mode='r',
+                                     offset=offset,
+                                     shape=shape)
+        else:
+            arrays[name] = np.fromfile(filename,
+                                       dtype=dtype,
+                                       count=int(np.prod(shape)),
+                                       offset=offset).reshape(shape)
+    return arrays, header['meta']
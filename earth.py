@@ -1,9 +1,9 @@
 import numpy as np
 import simpy
-from tqdm import tqdm
 import matplotlib.pyplot as plt
 from simu import Planet
 from simu import MultiPlanetSystem
+from simu import ResultCache
 from analyze import *
 
 if __name__ == "__main__":
@@ -13,6 +13,8 @@ if __name__ == "__main__":
     dt = day / 50
     runtime = year
 
+    # The cache runs copies of the planets in an environment of its own,
+    # this one is only needed to construct them.
     env = simpy.Environment(0)
 
     sun = Planet(env, 1.989e30, runtime=runtime, dt=dt, name='Sun')
@@ -24,21 +26,18 @@ if __name__ == "__main__":
                    dt=dt,
                    name='Earth')
 
-    solar = MultiPlanetSystem(env,
-                              planets=[earth, sun],
-                              runtime=runtime,
-                              dt=dt)
+    # Reruns with unchanged parameters and code load the stored result.
+    cache = ResultCache()
+    result = cache.run(MultiPlanetSystem,
+                       runtime=runtime,
+                       dt=dt,
+                       planets=[earth, sun])
 
-    with tqdm(total=int(runtime / dt), desc='Solar simulation') as pbar:
-        while env.now < runtime:
-            env.run(until=env.now + dt)
-            pbar.update(1)
-
-    data = np.array(solar.history)
+    data = np.array(result['history'])
     np.save('solar', data)
 
-    earth_pos = np.array(earth.simulation_data['position']).transpose()
-    sun_pos = np.array(sun.simulation_data['position']).transpose()
+    earth_pos = np.array(result['planet0/position']).transpose()
+    sun_pos = np.array(result['planet1/position']).transpose()
 
     fig, ax = plt.subplots()
     ax.plot(earth_pos[0], earth_pos[1], label='earth')
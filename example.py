@@ -7,10 +7,13 @@ from simu import Pendulum
 
 if __name__ == "__main__":
     fr = 30
-    k = 100
+    k = 10
 
     runtime = 15
+    # The integration step is independent of the frame rate, frames are
+    # interpolated from the dense output instead of picked from the steps.
     dt = 1/(fr * k)
+    frames = np.arange(0, runtime, 1 / fr)
     env = simpy.Environment(0)
     system = Pendulum(env=env,
                       mass=1,
@@ -19,16 +22,17 @@ if __name__ == "__main__":
                       init_angle=0,
                       init_speed=0,
                       runtime=runtime,
-                      dt=dt)
+                      dt=dt,
+                      t_eval=frames,
+                      record=False)
 
     with tqdm(total=int(runtime / dt), desc='Running simulation') as pbar:
         while env.now < runtime:
             env.run(until=env.now + dt)
             pbar.update(1)
 
-    t = system.simulation_data['time']
-    pos = np.array(system.simulation_data['position'])
-    velo = np.array(system.simulation_data['velocity'])
+    theta = system.dense_data['state'][:, 0]
+    pos = system.center + system.l * np.array([np.cos(theta), np.sin(theta)]).transpose()
 
     pos_x, pos_y = pos.transpose()
 
@@ -46,12 +50,6 @@ if __name__ == "__main__":
 
     line, = ax.plot([], [], 'o-', lw=2)
 
-    _ = []
-    for i in range(len(pos)):
-        if i % k == 0:
-            _.append(pos[i])
-    pos = _
-
     def anim_init():
         line.set_data([], [])
         return line,
@@ -1,8 +1,9 @@
 import numpy as np
-import simpy
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 from simu import Pendulum
+from simu import Event
+from simu import ResultCache
 from analyze import *
 
 if __name__ == "__main__":
@@ -12,30 +13,31 @@ if __name__ == "__main__":
     runtime = 50
     dt = 1 / (fr * k)
 
-    def simulation(mass, length, init_angle, init_speed, label):
-        env = simpy.Environment(0)
-        system = Pendulum(env=env,
-                          mass=mass,
-                          length=length,
-                          center=np.array([0, 0], dtype=np.float64),
-                          init_angle=init_angle,
-                          init_speed=init_speed,
-                          runtime=runtime,
-                          dt=dt)
+    # Points of the sweep that were already simulated are loaded from disk.
+    cache = ResultCache()
 
-        # with tqdm(total=int(runtime / dt), desc=f'Running simulation {label}') as pbar:
-        # while env.now < runtime:
-        # env.run(until=env.now + dt)
-        # pbar.update(1)
+    def simulation(mass, length, init_angle, init_speed):
+        # The pendulum hangs at -pi/2, every upward crossing of it starts a
+        # new period. Stop as soon as two of them are seen.
+        period_event = Event(lambda t, state: state[0] + np.pi / 2,
+                             terminal=True,
+                             direction=1,
+                             max_events=2)
+        result = cache.run(Pendulum,
+                           runtime=runtime,
+                           dt=dt,
+                           mass=mass,
+                           length=length,
+                           center=np.array([0, 0], dtype=np.float64),
+                           init_angle=init_angle,
+                           init_speed=init_speed,
+                           record_dtype=np.float32,
+                           events=[period_event])
 
-        env.run(until=runtime)
-
-        t = system.simulation_data['time']
-        pos = np.array(system.simulation_data['position'])
-        # velo = np.array(system.simulation_data['velocity'])
-
-        pos_x, pos_y = pos.transpose()
-        return Signal(pos_x, t=t, label=label)
+        crossing = result['event0/time']
+        if len(crossing) < 2:
+            return np.nan
+        return 1 / (crossing[1] - crossing[0])
 
     # x = []
     # for i in range(4):
@@ -55,8 +57,7 @@ if __name__ == "__main__":
             simulation(mass=1,
                        length=0.1,
                        init_angle=i,
-                       init_speed=0,
-                       label=f'init angle {i}').dominant_freq())
+                       init_speed=0))
 
     plt.plot(np.degrees(init_angle), dominant_freq)
 
@@ -64,4 +65,4 @@ if __name__ == "__main__":
 
     data = np.array([init_angle, dominant_freq])
     data = data.transpose()
-    np.savetxt('init_angle_dominant_freq.txt', data)
+    np.save('init_angle_dominant_freq', data)
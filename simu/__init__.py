@@ -1,3 +1,6 @@
 from .module import Pendulum
 from .module import Planet
 from .module import MultiPlanetSystem
+from .module import Event
+from .cache import ResultCache
+from .module import DenseOutput
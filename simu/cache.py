@@ -0,0 +1,239 @@
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
+import simpy
+from binfile import save_binary, load_binary
+
+CACHE_VERSION = 1
+
+# Attributes of bodies passed as parameters (planets) that do not change
+# the result.
+_VOLATILE = {'env', 'name', 'simulation_data'}
+
+
+def _code_digest(code):
+    h = hashlib.sha256(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            h.update(_code_digest(const).encode())
+        else:
+            h.update(repr(const).encode())
+    return h.hexdigest()
+
+
+def _constants(namespace: dict, names=None):
+    """The plain number and array values of `namespace`, e.g. module.G."""
+    if names is None:
+        names = [k for k in namespace if not k.startswith('_')]
+    return {
+        name: _normalize(namespace[name])
+        for name in sorted(set(names))
+        if name in namespace and not isinstance(namespace[name], bool)
+        and isinstance(namespace[name], (int, float, np.generic, np.ndarray))
+    }
+
+
+def _normalize(obj):
+    """Turn parameters into a json serializable, stable description."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.dtype):
+        return obj.str
+    if isinstance(obj, np.ndarray):
+        return {
+            'dtype': obj.dtype.str,
+            'shape': list(obj.shape),
+            'sha256': hashlib.sha256(np.ascontiguousarray(obj).tobytes()).hexdigest(),
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_normalize(o) for o in obj]
+    if isinstance(obj, dict):
+        return {str(k): _normalize(v) for k, v in sorted(obj.items())}
+    if isinstance(obj, complex):
+        return [obj.real, obj.imag]
+    if isinstance(obj, type):
+        return f'{obj.__module__}.{obj.__qualname__}'
+    if isinstance(obj, functools.partial):
+        return {
+            'partial': _normalize(obj.func),
+            'args': _normalize(obj.args),
+            'keywords': _normalize(obj.keywords),
+        }
+    if inspect.ismethod(obj):
+        return {'method': _normalize(obj.__func__), 'self': _normalize(obj.__self__)}
+    if inspect.isfunction(obj):
+        # Closures and defaults are hashed by value. Of the globals a function
+        # reads only plain numbers and arrays are, modules and functions are
+        # not.
+        closure = [c.cell_contents for c in obj.__closure__ or ()]
+        return {
+            'function': obj.__qualname__,
+            'code': _code_digest(obj.__code__),
+            'closure': _normalize(closure),
+            'defaults': _normalize(obj.__defaults__),
+            'kwdefaults': _normalize(obj.__kwdefaults__),
+            'globals': _constants(obj.__globals__, obj.__code__.co_names),
+        }
+    if isinstance(obj, np.ufunc):
+        return f'numpy.{obj.__name__}'
+    if inspect.isbuiltin(obj) and (obj.__self__ is None or inspect.ismodule(obj.__self__)):
+        return f'{obj.__module__}.{obj.__qualname__}'
+    if callable(obj) or not hasattr(obj, '__dict__'):
+        raise TypeError(
+            f'Cannot describe `{obj!r}` of type {type(obj).__qualname__} for the cache key.')
+    # Model objects such as planets or events: their class and parameters.
+    attrs = {
+        k: v
+        for k, v in vars(obj).items()
+        if not k.startswith('_') and k not in _VOLATILE
+    }
+    return {'class': _normalize(type(obj)), 'attrs': _normalize(attrs)}
+
+
+def _source_digest(model):
+    with open(inspect.getsourcefile(model), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_key(model, params: dict, runtime: float, dt: float, settings=None):
+    """Stable hash of everything that determines a simulation result.
+
+    This covers the model's source and the numeric constants of its module.
+    Functions among the parameters are hashed by code, closure values,
+    defaults and the numeric globals they read; other globals are not hashed
+    by value. `functools.partial` objects and bound methods are hashed with
+    their arguments and instance. Anything else that cannot be described,
+    e.g. a callable object, raises a TypeError instead of risking a stale
+    hit.
+
+    Args:
+        model (type): Model class, e.g. Pendulum.
+        params (dict): Constructor parameters other than env, runtime and dt.
+        runtime (float): Simulated time.
+        dt (float): Time step.
+        settings (optional): Any extra settings that change the result. Defaults to None.
+
+    Returns:
+        str: Hex digest.
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'model': _normalize(model),
+        'code': _source_digest(model),
+        # Module level constants the model reads, e.g. G or earth_gravity.
+        'constants': _constants(vars(inspect.getmodule(model))),
+        'params': _normalize(params),
+        'runtime': runtime,
+        'dt': dt,
+        'settings': _normalize(settings),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def collect_results(system):
+    """Recorded data of a finished model as a dict of arrays."""
+    result = {}
+    for name, values in getattr(system, 'simulation_data', {}).items():
+        result[name] = np.array(values)
+    if hasattr(system, 'history'):
+        result['history'] = np.array(system.history)
+    for i, planet in enumerate(getattr(system, 'planets', [])):
+        for name, values in planet.simulation_data.items():
+            result[f'planet{i}/{name}'] = np.array(values)
+    if getattr(system, 't_eval', None) is not None:
+        result['dense/time'] = system.dense_data['time']
+        result['dense/state'] = system.dense_data['state']
+    for i, data in enumerate(getattr(system, 'event_data', [])):
+        result[f'event{i}/time'] = np.array(data['time'], dtype=np.float64)
+        result[f'event{i}/state'] = np.array(data['state'])
+    return result
+
+
+class ResultCache:
+    """Content addressed on-disk cache of simulation results.
+
+    Results are keyed by `cache_key` and stored in the binary format of
+    `binfile`, one file per run. Hits refresh the file time, and the
+    least recently used files are removed once the cache grows beyond
+    `max_bytes`.
+    """
+
+    def __init__(self, directory: str = '.simu_cache', max_bytes: int = 1 << 30) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str):
+        return os.path.join(self.directory, f'{key}.bin')
+
+    def run(self, model, runtime: float, dt: float, collect=collect_results, settings=None, **params):
+        """Return the recorded results of a run, simulating only on a miss.
+
+        The model is built from a deep copy of `params`, with bodies (e.g.
+        planets) bound to the fresh environment the run uses, so the
+        caller's objects are left untouched on a hit and a miss alike.
+
+        Args:
+            model (type): Model class, constructed as model(env=env, runtime=runtime, dt=dt, **params).
+            runtime (float): Simulated time.
+            dt (float): Time step.
+            collect (callable, optional): Turns the finished model into a dict of arrays. Defaults to collect_results.
+            settings (optional): Extra settings included in the key. Defaults to None.
+
+        Returns:
+            dict: Array name to np.ndarray, memory mapped on a hit.
+        """
+        key = cache_key(model, params, runtime, dt, settings)
+        path = self.path(key)
+        if os.path.exists(path):
+            try:
+                arrays, _ = load_binary(path)
+                os.utime(path)
+                return arrays
+            except (OSError, ValueError):
+                os.remove(path)
+
+        env = simpy.Environment(0)
+        # Map every environment found on the bodies to the fresh one instead
+        # of copying it.
+        memo = {}
+        for value in params.values():
+            for body in value if isinstance(value, (list, tuple)) else [value]:
+                body_env = getattr(body, 'env', None)
+                if isinstance(body_env, simpy.Environment):
+                    memo[id(body_env)] = env
+        params = copy.deepcopy(params, memo)
+        system = model(env=env, runtime=runtime, dt=dt, **params)
+        env.run(until=runtime)
+        result = collect(system)
+        if hasattr(system, 'close'):
+            system.close()
+
+        save_binary(path, result, meta={'key': key, 't0': 0., 'dt': dt})
+        self.evict()
+        return result
+
+    def evict(self):
+        """Remove least recently used results until the cache fits `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.bin'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # Always keep the most recent entry.
+        for _, size, name in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -1,9 +1,288 @@
+import os
 import numpy as np
 import simpy
+from concurrent.futures import ThreadPoolExecutor
 
 earth_gravity = 9.80665
 
 
+class RecordBuffer:
+    """Growable array of records, one row per `append`.
+
+    Records are written into a preallocated array that doubles in size when
+    full, so each costs its itemsize rather than a Python object. The dtype
+    is that of the first record unless given. The buffer slices, iterates
+    and converts (np.array) like the recorded array.
+    """
+
+    def __init__(self, dtype=None, capacity: int = 1024) -> None:
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        # Runs known to be long start at most 2**20 rows and grow from there.
+        self.capacity = min(max(int(capacity), 1), 1 << 20)
+        self._data = None
+        self._n = 0
+
+    def append(self, value):
+        if self._data is None:
+            dtype = np.asarray(value).dtype if self.dtype is None else self.dtype
+            self._data = np.empty((self.capacity, ) + np.shape(value), dtype=dtype)
+        elif self._n == len(self._data):
+            self._data = np.concatenate([self._data, np.empty_like(self._data)])
+        self._data[self._n] = value
+        self._n += 1
+
+    @property
+    def values(self):
+        """The records so far, a view of shape (len(self), ...)."""
+        if self._data is None:
+            return np.empty(0, dtype=self.dtype or np.float64)
+        return self._data[:self._n]
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+
+def hermite_interpolate(t, t0, y0, f0, t1, y1, f1):
+    """Cubic Hermite interpolation of the state inside one step.
+
+    The step data may also be given per output time, i.e. `t0`, `t1` of
+    shape np.shape(t) and `y0`, `f0`, `y1`, `f1` of shape
+    np.shape(t) + state shape.
+
+    Args:
+        t (float | np.ndarray): Time(s) to evaluate, vectorized over an array.
+        t0, t1 (float): Begin and end time of the step.
+        y0, y1 (np.ndarray): State at `t0` and `t1`.
+        f0, f1 (np.ndarray): State derivative at `t0` and `t1`.
+
+    Returns:
+        np.ndarray: State at `t`, shape np.shape(t) + state shape.
+    """
+    extra = (1, ) * (np.ndim(y0) - np.ndim(t0))
+    h = np.asarray(t1 - t0, dtype=np.float64)
+    s = (np.asarray(t, dtype=np.float64) - t0) / h
+    s = s.reshape(s.shape + extra)
+    h = h.reshape(h.shape + extra)
+    h00 = (1 + 2 * s) * (1 - s)**2
+    h10 = s * (1 - s)**2
+    h01 = s**2 * (3 - 2 * s)
+    h11 = s**2 * (s - 1)
+    return h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
+
+
+class DenseOutput:
+    """Continuous extension of the integration over the recent steps.
+
+    Every step adds its end point with the state derivative there, and the
+    state at any time inside the covered steps is the cubic Hermite
+    interpolant of the enclosing step. Only the last `max_steps` steps are
+    kept (all of them when None).
+    """
+
+    def __init__(self, max_steps: int = None) -> None:
+        self.max_steps = max_steps
+        # Knots live in preallocated arrays grown by doubling (or a fixed
+        # window of max_steps + 1 knots), so evaluation never restacks them.
+        self._n = 0
+        self._t = None
+        self._y = None
+        self._f = None
+
+    def _push(self, t, y, f):
+        if self._t is None:
+            size = 16 if self.max_steps is None else self.max_steps + 1
+            self._t = np.empty(size)
+            self._y = np.empty((size, ) + np.shape(y))
+            self._f = np.empty((size, ) + np.shape(f))
+        if self._n == len(self._t):
+            if self.max_steps is None:
+                self._t = np.concatenate([self._t, np.empty_like(self._t)])
+                self._y = np.concatenate([self._y, np.empty_like(self._y)])
+                self._f = np.concatenate([self._f, np.empty_like(self._f)])
+            else:
+                # Drop the oldest knot.
+                self._t[:-1] = self._t[1:]
+                self._y[:-1] = self._y[1:]
+                self._f[:-1] = self._f[1:]
+                self._n -= 1
+        self._t[self._n] = t
+        self._y[self._n] = y
+        self._f[self._n] = f
+        self._n += 1
+
+    def add_step(self, t0, y0, f0, t1, y1, f1):
+        if self._n == 0 or self._t[self._n - 1] != t0:
+            self._push(t0, y0, f0)
+        self._push(t1, y1, f1)
+
+    @property
+    def t_min(self):
+        return self._t[0]
+
+    @property
+    def t_max(self):
+        return self._t[self._n - 1]
+
+    @property
+    def t_step(self):
+        """Begin time of the newest step."""
+        return self._t[self._n - 2]
+
+    def last_step(self, t):
+        """State at time(s) `t` inside the newest step only."""
+        n = self._n
+        return hermite_interpolate(t, self._t[n - 2], self._y[n - 2],
+                                   self._f[n - 2], self._t[n - 1],
+                                   self._y[n - 1], self._f[n - 1])
+
+    def __call__(self, t):
+        """State at time(s) `t` inside the covered steps.
+
+        Args:
+            t (float | np.ndarray): Time(s) to evaluate.
+
+        Returns:
+            np.ndarray: State(s), shape np.shape(t) + state shape.
+        """
+        if self._n < 2:
+            raise ValueError('No integration step has been taken yet.')
+        T = self._t[:self._n]
+        t = np.asarray(t, dtype=np.float64)
+        if np.any(t < T[0]) or np.any(t > T[-1]):
+            raise ValueError(
+                f'Requested time outside the covered range [{T[0]}, {T[-1]}].')
+        i = np.clip(np.searchsorted(T, t, side='right') - 1, 0, len(T) - 2)
+        return hermite_interpolate(t, T[i], self._y[i], self._f[i], T[i + 1],
+                                   self._y[i + 1], self._f[i + 1])
+
+
+def sample_dense(dense: DenseOutput, t_eval: np.ndarray, out: np.ndarray, index: int):
+    """Fill `out` at the requested times inside the newest step of `dense`.
+
+    Called after every step, so every covered time is filled exactly once.
+
+    Args:
+        dense (DenseOutput): Interpolant of the latest steps.
+        t_eval (np.ndarray): Sorted output times.
+        out (np.ndarray): Output array, one state per entry of `t_eval`.
+        index (int): First entry of `t_eval` not filled yet.
+
+    Returns:
+        int: First entry of `t_eval` still not filled.
+    """
+    index = max(index,
+                int(np.searchsorted(t_eval, dense.t_step, side='left')))
+    stop = int(np.searchsorted(t_eval, dense.t_max, side='right'))
+    if stop > index:
+        out[index:stop] = dense.last_step(t_eval[index:stop])
+    return max(index, stop)
+
+
+class Event:
+    """A zero crossing of `func(t, state)` watched during integration.
+
+    Args:
+        func (callable): Event function of time and state returning a float.
+        terminal (bool, optional): Stop the simulation once the event fired `max_events` times. Defaults to False.
+        direction (int, optional): Only count rising (> 0) or falling (< 0) crossings, 0 for both. Defaults to 0.
+        max_events (int, optional): Number of occurrences that stop a terminal event. Defaults to 1.
+        tol (float, optional): Root tolerance relative to the step size. Defaults to 1e-12.
+    """
+
+    def __init__(
+        self,
+        func,
+        terminal: bool = False,
+        direction: int = 0,
+        max_events: int = 1,
+        tol: float = 1e-12,
+    ) -> None:
+        self.func = func
+        self.terminal = terminal
+        self.direction = direction
+        self.max_events = max_events
+        self.tol = tol
+
+    def crossed(self, g0, g1):
+        if self.direction >= 0 and g0 < 0 <= g1:
+            return True
+        if self.direction <= 0 and g0 > 0 >= g1:
+            return True
+        return False
+
+    def locate(self, interp, t0, g0, t1, g1, max_iter: int = 100):
+        """Refine the crossing inside [t0, t1] with the Illinois method.
+
+        Args:
+            interp (callable): State at a time inside the step.
+
+        Returns:
+            float: Time of the crossing.
+        """
+        a, ga, b, gb = t0, g0, t1, g1
+        c = b
+        side = 0
+        for _ in range(max_iter):
+            c = (a * gb - b * ga) / (gb - ga)
+            gc = self.func(c, interp(c))
+            if gc == 0:
+                break
+            if np.sign(gc) == np.sign(gb):
+                b, gb = c, gc
+                if side == -1:
+                    ga /= 2
+                side = -1
+            else:
+                a, ga = c, gc
+                if side == 1:
+                    gb /= 2
+                side = 1
+            if abs(b - a) <= self.tol * (t1 - t0):
+                break
+        return c
+
+
+def detect_events(events, event_data, interp, t0, y0, t1, y1):
+    """Check the events over one step and record their occurrences.
+
+    Args:
+        events (list[Event]): Events to check.
+        event_data (list[dict]): Per event 'time' and 'state' lists to append to.
+        interp (callable): State at a time inside the step, e.g. a DenseOutput.
+        t0, y0 (float, np.ndarray): Time and state at the begin of the step.
+        t1, y1 (float, np.ndarray): Time and state at the end of the step.
+
+    Returns:
+        bool: Whether a terminal event asks to stop.
+    """
+    stop = False
+    for event, data in zip(events, event_data):
+        g0 = event.func(t0, y0)
+        g1 = event.func(t1, y1)
+        if not event.crossed(g0, g1):
+            continue
+        if g1 == 0:
+            t_event = t1
+        else:
+            t_event = event.locate(interp, t0, g0, t1, g1)
+        data['time'].append(t_event)
+        data['state'].append(interp(t_event))
+        if event.terminal and len(data['time']) >= event.max_events:
+            stop = True
+    return stop
+
+
 class Pendulum:
 
     def __init__(
@@ -16,6 +295,11 @@ class Pendulum:
         init_speed: float = 0.,
         runtime: float = 1.0,
         dt: float = 1 / 30,
+        record_dtype=np.float64,
+        events=None,
+        dense_output=False,
+        t_eval=None,
+        record: bool = True,
     ) -> None:
         self.env = env
         self.m = mass
@@ -35,17 +319,46 @@ class Pendulum:
 
         self.runtime = runtime
         self.dt = dt
+        # Integration always runs in float64, only the records are stored
+        # in `record_dtype` (e.g. np.float32). Time stays float64.
+        self.record_dtype = np.dtype(record_dtype)
 
+        n_steps = int(np.ceil(runtime / dt)) + 1
         self.simulation_data = {
-            'time': [],
-            'angle': [],
-            'a_velocity': [],
-            'position': [],
-            'velocity': [],
+            'time': RecordBuffer(np.float64, n_steps),
+            'angle': RecordBuffer(self.record_dtype, n_steps),
+            'a_velocity': RecordBuffer(self.record_dtype, n_steps),
+            'position': RecordBuffer(self.record_dtype, n_steps),
+            'velocity': RecordBuffer(self.record_dtype, n_steps),
         }
 
+        # Event functions are called as func(t, angular_state).
+        self.events = list(events or [])
+        self.event_data = [{'time': [], 'state': []} for _ in self.events]
+        self.stopped = False
+
+        # Dense output: `state_at` interpolates the angular state at any time
+        # of the kept steps (the last one, the last `dense_output` ones, or
+        # all of them for True). Times in `t_eval` are sampled into
+        # `dense_data` on the fly, so frame times do not constrain `dt` and
+        # with `record=False` no step needs to be stored.
+        self.dense = DenseOutput(None if dense_output is True else max(int(dense_output), 1))
+        self.record = record
+        self.t_eval = None if t_eval is None else np.asarray(t_eval, dtype=np.float64)
+        if self.t_eval is not None:
+            self.dense_data = {
+                'time': self.t_eval,
+                'state': np.full((len(self.t_eval), 2), np.nan, dtype=self.record_dtype),
+            }
+        self._eval_index = 0
+        self._deriv = None
+
         self.env.process(self.run())
 
+    def state_at(self, t):
+        """Angular state at time(s) `t`, interpolated from the kept steps."""
+        return self.dense(t)
+
     def _angle_to_linear(self, angular_state):
         theta, omega = angular_state
         r = np.array([np.cos(theta), np.sin(theta)])
@@ -67,7 +380,10 @@ class Pendulum:
     def update(self):
         t = self.env.now
         current_state = self.angular_state
-        k1 = self.state_equation(current_state, t)
+        if self._deriv is not None and self._deriv[0] is current_state:
+            k1 = self._deriv[1]  # The end derivative of the last step.
+        else:
+            k1 = self.state_equation(current_state, t)
         k2 = self.state_equation(current_state + k1 * self.dt / 2,
                                  t + self.dt / 2)
         k3 = self.state_equation(current_state + k2 * self.dt / 2,
@@ -80,13 +396,28 @@ class Pendulum:
         r, r_tangent, v = self._angle_to_linear([theta, omega])
         self.linear_state = np.array([r + self.center, v])
 
+        f1 = self.state_equation(self.angular_state, t + self.dt)
+        self._deriv = (self.angular_state, f1)
+        self.dense.add_step(t, current_state, k1, t + self.dt,
+                            self.angular_state, f1)
+        if self.t_eval is not None:
+            self._eval_index = sample_dense(self.dense, self.t_eval,
+                                            self.dense_data['state'],
+                                            self._eval_index)
+        if self.events:
+            self.stopped = detect_events(self.events, self.event_data,
+                                         self.dense.last_step, t,
+                                         current_state,
+                                         t + self.dt, self.angular_state)
+
     def run(self):
-        while self.env.now < self.runtime:
-            self.simulation_data['time'].append(self.env.now)
-            self.simulation_data['angle'].append(self.angular_state[0])
-            self.simulation_data['a_velocity'].append(self.angular_state[1])
-            self.simulation_data['position'].append(self.linear_state[0])
-            self.simulation_data['velocity'].append(self.linear_state[1])
+        while self.env.now < self.runtime and not self.stopped:
+            if self.record:
+                self.simulation_data['time'].append(self.env.now)
+                self.simulation_data['angle'].append(self.angular_state[0])
+                self.simulation_data['a_velocity'].append(self.angular_state[1])
+                self.simulation_data['position'].append(self.linear_state[0])
+                self.simulation_data['velocity'].append(self.linear_state[1])
             self.update()
             yield self.env.timeout(self.dt)
 
@@ -104,17 +435,23 @@ class Planet:
         runtime: float = 1,
         dt: float = 1e-3,
         name: str = '',
+        record_dtype=np.float64,
     ) -> None:
         self.env = env
         self.mass = mass
-        self.state = np.array([initial_position, initial_velocity])
+        self.state = np.array([initial_position, initial_velocity],
+                              dtype=np.float64)
         self.runtime = runtime
         self.dt = dt
+        self.record_dtype = np.dtype(record_dtype)
 
+        # The record dtype is taken from the first saved state, so a system
+        # may still change `record_dtype` before running.
+        n_steps = int(np.ceil(runtime / dt)) + 1
         self.simulation_data = {
-            'time': [],
-            'position': [],
-            'velocity': [],
+            'time': RecordBuffer(np.float64, n_steps),
+            'position': RecordBuffer(capacity=n_steps),
+            'velocity': RecordBuffer(capacity=n_steps),
         }
         if name == '':
             name = f'Planet{Planet.__planet_default_name_counter__}'
@@ -131,13 +468,51 @@ class Planet:
     
     def save_state(self):
         self.simulation_data['time'].append(self.env.now)
-        self.simulation_data['position'].append(self.state[0])
-        self.simulation_data['velocity'].append(self.state[1])
+        state = self.state.astype(self.record_dtype)
+        self.simulation_data['position'].append(state[0])
+        self.simulation_data['velocity'].append(state[1])
 
 def gravity(target: Planet, source: Planet):
     r = target.state[0] - source.state[0]
     return G * target.mass * source.mass / (np.linalg.norm(r) ** 3) * r
 
+def block_acceleration(pos: np.ndarray, mass: np.ndarray, targets: np.ndarray, block_size: int = 128, return_nearest: bool = False):
+    """Gravitational acceleration of the `targets` bodies from all bodies.
+
+    Sources are processed in blocks of `block_size`, so every temporary is a
+    `(len(targets), block_size)` tile that fits in cache. Only numpy ufuncs
+    and reductions are used, which release the GIL, so target blocks can be
+    evaluated in parallel threads.
+
+    Args:
+        pos (np.ndarray): Positions of all bodies, shape (n, dim).
+        mass (np.ndarray): Masses of all bodies, shape (n,).
+        targets (np.ndarray): Indices of the bodies to evaluate.
+        block_size (int, optional): Number of sources per tile. Defaults to 128.
+        return_nearest (bool, optional): Also return the distance of each target to its nearest body. Defaults to False.
+
+    Returns:
+        np.ndarray: Acceleration of each target, shape (len(targets), dim).
+        np.ndarray: Nearest distance of each target, only if `return_nearest`.
+    """
+    p = pos[targets]
+    acc = np.zeros(p.shape, dtype=np.float64)
+    nearest = np.full(len(targets), np.inf)
+    for j0 in range(0, len(pos), block_size):
+        j1 = min(j0 + block_size, len(pos))
+        diff = [pos[j0:j1, k][None, :] - p[:, k][:, None] for k in range(p.shape[1])]
+        d2 = sum(d * d for d in diff)
+        # A body does not attract itself.
+        d2[targets[:, None] == np.arange(j0, j1)[None, :]] = np.inf
+        w = mass[j0:j1] * d2**-1.5
+        for k in range(p.shape[1]):
+            acc[:, k] += (w * diff[k]).sum(axis=1)
+        if return_nearest:
+            np.minimum(nearest, d2.min(axis=1), out=nearest)
+    if return_nearest:
+        return G * acc, np.sqrt(nearest)
+    return G * acc
+
 class MultiPlanetSystem:
     def __init__(
         self,
@@ -145,67 +520,228 @@ class MultiPlanetSystem:
         planets: list[Planet],
         runtime: float = 1,
         dt: float = 1e-3,
+        record_dtype=None,
+        workers: int = 1,
+        block_size: int = 128,
+        max_level: int = 0,
+        eta: float = 0.02,
+        events=None,
+        dense_output=False,
+        t_eval=None,
+        record: bool = True,
     ) -> None:
         self.env = env
         assert len(planets) != 0, "Initializing a Multi-planet system with no planets."
         self.planets = planets
+        self.mass = np.array([planet.mass for planet in planets], dtype=np.float64)
+        # Force evaluation is tiled into `block_size` target/source blocks;
+        # with `workers` > 1 (None for one per core) target blocks run in a
+        # thread pool, which lives until `close()` is called.
+        self.block_size = block_size
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self._executor = None
+        if workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+        # With `max_level` > 0 every body steps with dt / 2**level, its level
+        # chosen from eta * sqrt(nearest distance / acceleration), and only
+        # the bodies ending a step get their forces recomputed.
+        self.max_level = max_level
+        self.eta = eta
+        self.level = np.zeros(len(planets), dtype=int)
+        self._acce = None
+        self.force_evaluations = 0
         self.runtime = runtime
         self.dt = dt
+        # Precision of the recorded `history`. When given, it also applies to
+        # the planets' `simulation_data`.
+        if record_dtype is None:
+            self.record_dtype = np.dtype(np.float64)
+        else:
+            self.record_dtype = np.dtype(record_dtype)
+            for planet in planets:
+                planet.record_dtype = self.record_dtype
         self.state = []
         for planet in planets:
             self.state.append(planet.state)
-        self.state = np.array(self.state)
+        self.state = np.array(self.state, dtype=np.float64)
         
-        self.history = []
+        self.history = RecordBuffer(self.record_dtype, int(np.ceil(runtime / dt)) + 1)
+
+        # Event functions are called as func(t, state) with the full system state.
+        self.events = list(events or [])
+        self.event_data = [{'time': [], 'state': []} for _ in self.events]
+        self.stopped = False
+
+        # Dense output, as for Pendulum: `state_at` interpolates the system
+        # state and `t_eval` times are sampled into `dense_data`.
+        self.dense = DenseOutput(None if dense_output is True else max(int(dense_output), 1))
+        self.record = record
+        self.t_eval = None if t_eval is None else np.asarray(t_eval, dtype=np.float64)
+        if self.t_eval is not None:
+            self.dense_data = {
+                'time': self.t_eval,
+                'state': np.full((len(self.t_eval), ) + self.state.shape, np.nan, dtype=self.record_dtype),
+            }
+        self._eval_index = 0
+        self._deriv = None
 
         self.env.process(self.run())
 
+    def state_at(self, t):
+        """System state at time(s) `t`, interpolated from the kept steps."""
+        return self.dense(t)
+
     def state_equation(self, state, t):
         # Assume state is a array of shape (len(self.planets), 2).
         # For example, if 3 plantes are running in a plain surface,
         # then the state shape should be (3,2).
         # Each state in state list should countain a position and velocity.
         # And the mass of each planet is given by self.planet
-        # velo = []
-        # acce = []
-        ret = []
-        mass = [planet.mass for planet in self.planets]
-        assert len(mass) == len(state), f"Input state({len(state)}) has a different dimention with planets({len(mass)})."
-        for i in range(len(state)):
-            s = state[i]
-            # velo.append(s[1])
-            a = 0
-            for j in range(len(mass)):
-                if i != j:
-                    target = state[j]
-                    r = target[0] - s[0]
-                    a += G * mass[j] / (np.linalg.norm(r) ** 3) * r
-            # acce.append(a)
-            ret.append(np.array([s[1], a], dtype=np.float64))
-        # ret = np.array([velo, acce], dtype=np.float64).transpose()
-        ret = np.array(ret)
-        return ret
+        assert len(self.mass) == len(state), f"Input state({len(state)}) has a different dimention with planets({len(self.mass)})."
+        acce = self.acceleration(state[:, 0])
+        return np.stack([state[:, 1], acce], axis=1)
+
+    def acceleration(self, pos, targets=None, return_nearest=False):
+        """Gravitational acceleration of the bodies at `pos`.
+
+        Args:
+            pos (np.ndarray): Positions of all bodies, shape (n, dim).
+            targets (np.ndarray, optional): Indices of the bodies to evaluate. Defaults to None (all).
+            return_nearest (bool, optional): Also return the distance of each target to its nearest body. Defaults to False.
+
+        Returns:
+            np.ndarray: Acceleration of each target, shape (len(targets), dim).
+            np.ndarray: Nearest distance of each target, only if `return_nearest`.
+        """
+        if targets is None:
+            targets = np.arange(len(pos))
+        self.force_evaluations += len(targets)
+        blocks = [
+            targets[i:i + self.block_size]
+            for i in range(0, len(targets), self.block_size)
+        ]
+
+        def evaluate(block):
+            return block_acceleration(pos, self.mass, block, self.block_size,
+                                      return_nearest)
+
+        if self._executor is None or len(blocks) == 1:
+            parts = [evaluate(block) for block in blocks]
+        else:
+            parts = list(self._executor.map(evaluate, blocks))
+        if return_nearest:
+            return (np.concatenate([p[0] for p in parts]),
+                    np.concatenate([p[1] for p in parts]))
+        return np.concatenate(parts)
+
+    def _timestep_level(self, acce, nearest):
+        """Power-of-two step level of each body, its step is dt / 2**level."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = self.eta * np.sqrt(nearest / np.linalg.norm(acce, axis=1))
+            level = np.ceil(np.log2(self.dt / tau))
+        level = np.nan_to_num(level, nan=0, posinf=self.max_level, neginf=0)
+        return np.clip(level, 0, self.max_level).astype(int)
+
+    def _block_step(self):
+        """Advance the system by dt with hierarchical block time-steps.
+
+        The base step is split into 2**max_level ticks. All bodies drift
+        between the ticks where some step ends, while only the bodies
+        starting or ending a step are kicked (kick-drift-kick leapfrog) and
+        only those ending one get their forces recomputed. All bodies are
+        synchronized again after dt.
+
+        Returns:
+            np.ndarray: The new state.
+        """
+        pos = self.state[:, 0].copy()
+        vel = self.state[:, 1].copy()
+        if self._acce is None:
+            self._acce, nearest = self.acceleration(pos, return_nearest=True)
+            self.level = self._timestep_level(self._acce, nearest)
+
+        n_ticks = 2**self.max_level
+        tick = self.dt / n_ticks
+        i = 0
+        while i < n_ticks:
+            span = 2**(self.max_level - self.level)  # ticks per step
+            active = i % span == 0
+            vel[active] += self._acce[active] * (span[active] * tick / 2)[:, None]
+
+            # Drift straight to the next tick where some step ends.
+            end = (i // span + 1) * span
+            j = int(end.min())
+            pos += vel * ((j - i) * tick)
+
+            ending = np.flatnonzero(end == j)
+            acce, nearest = self.acceleration(pos, ending, return_nearest=True)
+            self._acce[ending] = acce
+            vel[ending] += acce * (span[ending] * tick / 2)[:, None]
+            # A longer step may only start on a boundary of that step.
+            aligned = self.max_level - int(np.log2(j & -j))
+            self.level[ending] = np.maximum(
+                self._timestep_level(acce, nearest), aligned)
+            i = j
+
+        return np.stack([pos, vel], axis=1)
+
+    def close(self):
+        """Shut down the force evaluation thread pool.
+
+        Call this once the run is over when `workers` > 1, the threads are
+        not released before.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
 
     def update(self):
         t = self.env.now
         current_state = self.state
-        k1 = self.state_equation(current_state, t)
-        k2 = self.state_equation(current_state + k1 * self.dt / 2,
-                                 t + self.dt / 2)
-        k3 = self.state_equation(current_state + k2 * self.dt / 2,
-                                 t + self.dt / 2)
-        k4 = self.state_equation(current_state + k3 * self.dt, t + self.dt)
+        if self._deriv is not None and self._deriv[0] is current_state:
+            k1 = self._deriv[1]  # The end derivative of the last step.
+        else:
+            k1 = self.state_equation(current_state, t)
+        if self.max_level > 0:
+            state = self._block_step()
+            # Every body ends the base step with a fresh force evaluation.
+            f1 = np.stack([state[:, 1], self._acce], axis=1)
+        else:
+            k2 = self.state_equation(current_state + k1 * self.dt / 2,
+                                     t + self.dt / 2)
+            k3 = self.state_equation(current_state + k2 * self.dt / 2,
+                                     t + self.dt / 2)
+            k4 = self.state_equation(current_state + k3 * self.dt, t + self.dt)
 
-        k = (k1 + 2 * k2 + 2 * k3 + k4) / 6
-        state = current_state + k * self.dt
+            k = (k1 + 2 * k2 + 2 * k3 + k4) / 6
+            state = current_state + k * self.dt
+            f1 = self.state_equation(state, t + self.dt)
         self.state = state
         for i in range(len(self.planets)):
             planet = self.planets[i]
-            planet.update(state[i])
+            if self.record:
+                planet.update(state[i])
+            else:
+                planet.state = state[i]
+
+        self._deriv = (state, f1)
+        self.dense.add_step(t, current_state, k1, t + self.dt, state, f1)
+        if self.t_eval is not None:
+            self._eval_index = sample_dense(self.dense, self.t_eval,
+                                            self.dense_data['state'],
+                                            self._eval_index)
+        if self.events:
+            self.stopped = detect_events(self.events, self.event_data,
+                                         self.dense.last_step, t,
+                                         current_state,
+                                         t + self.dt, state)
 
     def run(self):
-        while self.env.now < self.runtime:
-            self.history.append(self.state)
+        while self.env.now < self.runtime and not self.stopped:
+            if self.record:
+                self.history.append(self.state)
             self.update()
             yield self.env.timeout(self.dt)
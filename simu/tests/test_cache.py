@@ -0,0 +1,104 @@
+import functools
+import os
+import numpy as np
+import pytest
+import simu.module
+from simu.cache import ResultCache, cache_key
+from simu.module import Event, MultiPlanetSystem, Pendulum, Planet
+
+
+def _key(**params):
+    return cache_key(Pendulum, params, runtime=1., dt=1e-2)
+
+
+def _offset(t, state, a):
+    return state[0] - a
+
+
+class _Offset:
+
+    def __init__(self, a):
+        self.a = a
+
+    def func(self, t, state):
+        return state[0] - self.a
+
+
+class _Callable:
+
+    def __call__(self, t, state):
+        return state[0]
+
+
+def test_key_depends_on_function_defaults():
+    first = _key(events=[Event(lambda t, s, a=0.1: s[0] - a)])
+    second = _key(events=[Event(lambda t, s, a=0.2: s[0] - a)])
+    assert first != second
+    first = _key(events=[Event(lambda t, s, *, a=0.1: s[0] - a)])
+    second = _key(events=[Event(lambda t, s, *, a=0.2: s[0] - a)])
+    assert first != second
+
+
+def test_key_depends_on_partial_arguments():
+    assert (_key(events=[Event(functools.partial(_offset, a=.1))]) !=
+            _key(events=[Event(functools.partial(_offset, a=.2))]))
+    assert (_key(events=[Event(functools.partial(_offset, a=.1))]) ==
+            _key(events=[Event(functools.partial(_offset, a=.1))]))
+
+
+def test_key_depends_on_bound_instance():
+    assert (_key(events=[Event(_Offset(.1).func)]) !=
+            _key(events=[Event(_Offset(.2).func)]))
+    assert (_key(events=[Event(_Offset(.1).func)]) ==
+            _key(events=[Event(_Offset(.1).func)]))
+
+
+def test_key_depends_on_module_constants(monkeypatch):
+    planets = [Planet(None, 1e24), Planet(None, 1e24, np.array([1e8, 0.]))]
+    before = cache_key(MultiPlanetSystem, {'planets': planets}, 1., 1e-2)
+    monkeypatch.setattr(simu.module, 'G', 2 * simu.module.G)
+    assert cache_key(MultiPlanetSystem, {'planets': planets}, 1., 1e-2) != before
+
+
+def test_key_refuses_unknown_callables():
+    with pytest.raises(TypeError):
+        _key(events=[Event(_Callable())])
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    params = dict(init_angle=-1., record_dtype=np.float32)
+    miss = cache.run(Pendulum, runtime=.5, dt=1e-2, **params)
+    assert not isinstance(miss['angle'], np.memmap)
+    hit = cache.run(Pendulum, runtime=.5, dt=1e-2, **params)
+    assert isinstance(hit['angle'], np.memmap)
+    for name in miss:
+        np.testing.assert_array_equal(hit[name], miss[name])
+    other = cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-.5)
+    assert not isinstance(other['angle'], np.memmap)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_corrupt_entry_is_recomputed(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    expected = cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-1.)
+    path, = [tmp_path / name for name in os.listdir(tmp_path)]
+    path.write_bytes(path.read_bytes()[:20])
+    result = cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-1.)
+    np.testing.assert_array_equal(result['angle'], expected['angle'])
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-1.)
+    first, = os.listdir(tmp_path)
+    cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-.5)
+    second, = set(os.listdir(tmp_path)) - {first}
+    os.utime(tmp_path / first, (1, 1))
+    os.utime(tmp_path / second, (2, 2))
+    # The hit makes the first entry the most recently used one.
+    cache.run(Pendulum, runtime=.5, dt=1e-2, init_angle=-1.)
+
+    cache.max_bytes = os.path.getsize(tmp_path / first)
+    cache.evict()
+    assert os.listdir(tmp_path) == [first]
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import simpy
+from simu.module import Event, Pendulum, RecordBuffer, earth_gravity
+
+
+def _exact_period(length, amplitude):
+    # 4 sqrt(l / g) K(k) with k = sin(amplitude / 2), K from the
+    # arithmetic-geometric mean.
+    a, b = 1., np.sqrt(1 - np.sin(amplitude / 2)**2)
+    for _ in range(10):
+        a, b = (a + b) / 2, np.sqrt(a * b)
+    return 4 * np.sqrt(length / earth_gravity) * np.pi / (2 * a)
+
+
+def test_record_buffer_grows():
+    buffer = RecordBuffer(np.float32, capacity=3)
+    rows = np.arange(20, dtype=np.float64).reshape(10, 2)
+    for row in rows:
+        buffer.append(row)
+    assert len(buffer) == 10
+    assert np.array(buffer).dtype == np.float32
+    np.testing.assert_array_equal(np.array(buffer), rows)
+    np.testing.assert_array_equal(buffer[4:], rows[4:])
+
+
+def test_pendulum_records_in_record_dtype():
+    env = simpy.Environment(0)
+    pendulum = Pendulum(env, init_angle=-1., runtime=1., dt=1e-2,
+                        record_dtype=np.float32)
+    env.run(until=1.)
+    data = pendulum.simulation_data
+    assert len(data['time']) == len(data['angle']) > 0
+    assert np.array(data['time']).dtype == np.float64
+    for name in ('angle', 'a_velocity', 'position', 'velocity'):
+        assert np.array(data[name]).dtype == np.float32
+    assert np.array(data['position']).shape == (len(data['time']), 2)
+
+
+def test_event_period_matches_exact_period():
+    length, amplitude = 0.1, 1.
+    env = simpy.Environment(0)
+    # The pendulum hangs at -pi/2, every upward crossing starts a period.
+    event = Event(lambda t, state: state[0] + np.pi / 2,
+                  terminal=True,
+                  direction=1,
+                  max_events=2)
+    pendulum = Pendulum(env,
+                        length=length,
+                        init_angle=-np.pi / 2 + amplitude,
+                        runtime=5.,
+                        dt=1e-3,
+                        events=[event],
+                        record=False)
+    env.run(until=5.)
+    crossing = pendulum.event_data[0]['time']
+    assert len(crossing) == 2
+    assert pendulum.stopped and pendulum.dense.t_max < 1.
+    np.testing.assert_allclose(crossing[1] - crossing[0],
+                               _exact_period(length, amplitude),
+                               rtol=1e-8)
+    np.testing.assert_allclose(pendulum.event_data[0]['state'][0][0],
+                               -np.pi / 2,
+                               atol=1e-10)
+
+
+def _pendulum(dt, **kwargs):
+    env = simpy.Environment(0)
+    pendulum = Pendulum(env,
+                        length=0.1,
+                        init_angle=-np.pi / 2 + 1.,
+                        runtime=1.,
+                        dt=dt,
+                        **kwargs)
+    env.run(until=1.)
+    return pendulum
+
+
+def test_t_eval_matches_fine_steps():
+    t_eval = np.linspace(0, 1, 77)
+    coarse = _pendulum(1e-2, t_eval=t_eval, record=False)
+    fine = _pendulum(1e-3, t_eval=t_eval, record=False)
+    assert len(coarse.simulation_data['time']) == 0
+    assert not np.any(np.isnan(coarse.dense_data['state']))
+    np.testing.assert_allclose(coarse.dense_data['state'],
+                               fine.dense_data['state'],
+                               atol=1e-6)
+
+
+def test_dense_output_window():
+    t_eval = np.linspace(0, 1, 77)
+    full = _pendulum(1e-2, dense_output=True, t_eval=t_eval)
+    # Grown past its initial capacity, the interpolant covers the whole run.
+    assert full.dense.t_min == 0 and full.dense.t_max >= 1 - 1e-9
+    np.testing.assert_allclose(full.state_at(t_eval),
+                               full.dense_data['state'],
+                               atol=1e-12)
+    # It passes through the recorded steps.
+    time = np.array(full.simulation_data['time'])
+    np.testing.assert_allclose(full.state_at(time)[:, 0],
+                               full.simulation_data['angle'],
+                               atol=1e-12)
+
+    window = _pendulum(1e-2, dense_output=2)
+    assert window.dense.t_max - window.dense.t_min == pytest.approx(2e-2)
+    with pytest.raises(ValueError):
+        window.state_at(.5)
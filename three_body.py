@@ -23,7 +23,8 @@ current_time = 0
 
 def simu_data_gen():
     # dt = 1 / FPS / 15
-    dt = 1e-4
+    # Close encounters drop to smaller block steps, down to dt / 2**12.
+    dt = 1 / FPS / 4
     runtime = 2e8
 
     env = simpy.Environment(0)
@@ -47,13 +48,24 @@ def simu_data_gen():
                dt=dt) for i in range(3)
     ]
 
-    s = MultiPlanetSystem(env, planets, runtime=runtime, dt=dt)
-
-    while env.now < runtime:
-        env.run(until=env.now + 1 / FPS)
+    s = MultiPlanetSystem(env,
+                          planets,
+                          runtime=runtime,
+                          dt=dt,
+                          max_level=12,
+                          dense_output=2,
+                          record=False)
+
+    frame_time = 0.
+    while frame_time < runtime:
+        # Make sure the step covering the frame has been taken, then
+        # interpolate the frame instead of stepping to it.
+        if env.now < frame_time + dt:
+            env.run(until=frame_time + dt)
         global current_time
-        current_time = env.now
-        yield s.state
+        current_time = frame_time
+        yield s.state_at(frame_time)
+        frame_time += 1 / FPS
 
 
 x_min = y_min = -R